@@ -8,34 +8,89 @@ Minecraft Server Telegram Bot
 """
 
 import asyncio
-import json
+import atexit
+import fnmatch
 import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
 import subprocess
 import sys
 import tarfile
 from datetime import datetime, time
 from logging import getLogger
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
 
 import aiocron
-from aiogram import Bot, Dispatcher, F, Router, types
+import orjson
+from aiogram import BaseMiddleware, Bot, Dispatcher, F, Router, types
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.filters import Command, CommandObject
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.filters.callback_data import CallbackData
+from aiogram.methods import EditMessageText, SendDocument, SendMessage, TelegramMethod
 from aiogram.types import (
     CallbackQuery,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     Message,
+    TelegramObject,
 )
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+try:
+    import uvloop
+except ImportError:
+    # uvloop необязателен (и недоступен в Windows) - тогда работаем на стандартном цикле asyncio
+    uvloop = None
+
 ROOT_DIR = Path(__file__).parent
 ENV_FILE = ROOT_DIR / ".env"
 
+# Запущен ли бот от root (в Windows нет geteuid - считаем, что нет)
+_geteuid = getattr(os, "geteuid", None)
+IS_ROOT = bool(_geteuid and _geteuid() == 0)
+
+# Размер блока при отправке файлов: aiogram читает их через aiofiles,
+# и каждый блок - это отдельный переход в поток, поэтому берем 1 МиБ вместо 64 КиБ
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Файлы мира, которые не нужны в бэкапе: блокировки, копии *_old и временные файлы
+BACKUP_EXCLUDE_PATTERNS = ("*.lock", "*_old", "*.tmp")
+
+# Ответы на запросы не от администратора
+DENY_MESSAGE_TEXT = "⛔ У вас нет доступа к этой команде."
+DENY_CALLBACK_TEXT = "⛔ Нет доступа"
+
+MAIN_MENU_TEXT = "🤖 <b>Главное меню</b>\nВыберите действие:"
+
+# Ответ на введенный текст: (текст сообщения, клавиатура)
+InputReply = Tuple[str, InlineKeyboardMarkup]
+
+# Время в формате ЧЧ:ММ (часы 0-23, минуты 0-59)
+TIME_RE = re.compile(r"([01]?\d|2[0-3]):([0-5]?\d)")
+
+# Кнопки, которые только отправляют одну команду на сервер:
+# callback_data -> (команда, ключ ограничения частоты, ответ на нажатие)
+SERVER_COMMAND_BUTTONS: Dict[str, Tuple[str, str, str]] = {
+    "save_world": ("save-all", "save_world", "💾 Команда сохранения отправлена"),
+    "weather_clear": ("weather clear", "weather", "☀️ Команда установки ясной погоды отправлена"),
+    "weather_rain": ("weather rain", "weather", "🌧️ Команда установки дождя отправлена"),
+    "weather_thunder": ("weather thunder", "weather", "⛈️ Команда установки грозы отправлена"),
+    "time_day": ("time set day", "time", "🕐 Команда установки дня отправлена"),
+    "time_night": ("time set night", "time", "🌙 Команда установки ночи отправлена"),
+    "list_players": ("list", "list_players", "📋 Команда списка игроков отправлена, проверьте логи"),
+    "refresh_whitelist": ("whitelist reload", "refresh_whitelist", "🔄 Белый список обновлен на сервере"),
+}
+
 logger = getLogger(__name__)
 
 if not ENV_FILE.exists():
@@ -45,6 +100,7 @@ if not ENV_FILE.exists():
 class Config(BaseSettings):
     TOKEN_BOT: SecretStr
     ADMIN_ID: int
+    ADMIN_IDS: List[int] = []  # Дополнительные администраторы, JSON-список: [111, 222]
     BACKUP_CHAT_ID: int
     
     SERVER_IP: str = "195.10.205.59"
@@ -81,27 +137,131 @@ class ColorFormatter(logging.Formatter):
     MAGENTA = '\033[95m'
     RESET = '\033[0m'
     
+    _COLORS = {
+        logging.INFO: GREEN,
+        logging.ERROR: RED,
+        logging.WARNING: YELLOW,
+        logging.DEBUG: MAGENTA,
+    }
+    
     def format(self, record):
-        color = self.RESET
-        if record.levelno == logging.INFO:
-            color = self.GREEN
-        elif record.levelno == logging.ERROR:
-            color = self.RED
-        elif record.levelno == logging.WARNING:
-            color = self.YELLOW
-        elif record.levelno == logging.DEBUG:
-            color = self.MAGENTA
-        
-        record.levelname = f"{color}{record.levelname}{self.RESET}"
-        record.msg = f"{color}{record.msg}{self.RESET}"
-        return super().format(record)
+        # Красим готовую строку, не изменяя record - его используют и другие обработчики
+        color = self._COLORS.get(record.levelno, self.RESET)
+        return f"{color}{super().format(record)}{self.RESET}"
+
+
+class RemovePlayerCallback(CallbackData, prefix="rmp"):
+    """Кнопка удаления игрока из белого списка."""
+    name: str
+
+
+class BackupIntervalCallback(CallbackData, prefix="interval"):
+    """Кнопка выбора интервала автобэкапов."""
+    interval: str
+
+
+class AdminMiddleware(BaseMiddleware):
+    """Пропускает к обработчикам только администраторов."""
+    
+    def __init__(self, admins: FrozenSet[int]):
+        self.admins = admins
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = getattr(event, "from_user", None)
+        if user is not None and user.id in self.admins:
+            return await handler(event, data)
+        
+        if isinstance(event, CallbackQuery):
+            await event.answer(DENY_CALLBACK_TEXT, show_alert=True)
+        elif isinstance(event, Message) and "command" in data:
+            # Отказ - только на команды этого бота (сработал фильтр Command);
+            # на обычный текст и чужие команды в группах молчим
+            await event.answer(DENY_MESSAGE_TEXT)
+        return None
+
+
+class TokenBucket:
+    """Ограничитель частоты: rate разрешений в секунду, не больше capacity подряд."""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+        # Ожидающие получают разрешения по очереди
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Придерживает исходящие сообщения, чтобы не упираться в лимиты Telegram, а на 429 ждет и повторяет запрос."""
+    
+    # Методы, на которые распространяется общий лимит (~30 сообщений в секунду на бота)
+    LIMITED_METHODS = (SendMessage, SendDocument, EditMessageText)
+    # Новые сообщения в один чат - не чаще ~1 в секунду, с небольшим запасом на всплеск
+    PER_CHAT_METHODS = (SendMessage, SendDocument)
+    # Сколько раз повторяем запрос, на который Telegram ответил 429
+    MAX_RETRIES = 3
+    
+    def __init__(self):
+        self.global_bucket = TokenBucket(rate=30, capacity=30)
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        # До этого момента (по monotonic) Telegram просил ничего не отправлять
+        self.halt_until = 0.0
+    
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        if isinstance(method, self.LIMITED_METHODS):
+            chat_id = getattr(method, "chat_id", None)
+            if chat_id is not None and isinstance(method, self.PER_CHAT_METHODS):
+                bucket = self.chat_buckets.get(chat_id)
+                if bucket is None:
+                    bucket = self.chat_buckets[chat_id] = TokenBucket(rate=1, capacity=3)
+                await bucket.acquire()
+            await self.global_bucket.acquire()
+        
+        attempt = 0
+        while True:
+            # Пока действует пауза от Telegram, придерживаем все запросы, а не только повторный
+            delay = self.halt_until - monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.MAX_RETRIES:
+                    raise
+                logger.warning(f"Telegram ограничил частоту запросов, повтор через {e.retry_after} сек.")
+                self.halt_until = max(self.halt_until, monotonic() + e.retry_after)
 
 
 class MinecraftServerBot:
     def __init__(self, config: Config):
         self.config = config
         self.server_dir = Path("/server")  # Путь внутри контейнера
-        self.backup_dir = Path("/app/backups")  # Путь внутри контейнера
+        # Путь внутри контейнера. Должен быть на обычном диске (не tmpfs и не FUSE),
+        # чтобы бэкапы читались при отправке потоком с нормальным упреждающим чтением
+        self.backup_dir = Path("/app/backups")
         self.backup_dir.mkdir(exist_ok=True)
         
         # Файлы сервера
@@ -111,7 +271,37 @@ class MinecraftServerBot:
         self.server_log = self.server_dir / "logs" / "latest.log"
         
         # Кэш белого списка
-        self.whitelist_cache: List[Dict] = []
+        self.whitelist_cache: Dict[str, Dict] = {}  # имя игрока -> запись, в порядке файла
+        self._wl_names_lower: Set[str] = set()  # имена в нижнем регистре: ники Minecraft не различают регистр
+        self._wl_stamp: Optional[Tuple[int, int]] = None  # (st_mtime_ns, st_size)
+        self._wl_hash: Optional[int] = None  # хэш содержимого файла
+        
+        # Кэш настроек RCON (mtime server.properties, enabled, port, password) и соединение
+        self._rcon_cfg_cache: Optional[Tuple[int, bool, int, str]] = None
+        self._rcon = None
+        self._rcon_lock = asyncio.Lock()
+        
+        # Версия Java не меняется без перезапуска бота
+        self._java_version: Optional[str] = None
+        
+        # Кратковременный кэш статуса/информации: ключ -> (время запроса, задача)
+        self._cache: Dict[str, Tuple[float, asyncio.Future]] = {}
+        
+        # Сообщения, ожидающие ответа с вводом: (чат, ID сообщения) -> режим ввода
+        self._awaiting_input: Dict[Tuple[int, int], str] = {}
+        self._input_handlers: Dict[str, Callable[[Message], Awaitable[Optional[InputReply]]]] = {
+            "add_player": self._on_add_player_input,
+            "send_message": self._on_send_message_input,
+            "backup_time": self._on_backup_time_input,
+            "backup_count": self._on_backup_count_input,
+            "logs_time": self._on_logs_time_input,
+        }
+        
+        # Время последнего нажатия быстрых RCON-кнопок: (пользователь, действие) -> monotonic()
+        self._last_action: Dict[Tuple[int, str], float] = {}
+        
+        # Отложенная остановка/перезагрузка сервера, выполняемая в фоне
+        self._server_action_task: Optional[asyncio.Task] = None
         
         # Настройки автобэкапов
         self.backup_settings = {
@@ -121,6 +311,9 @@ class MinecraftServerBot:
             "keep_count": self.config.AUTO_BACKUP_KEEP_COUNT
         }
         self.backup_job = None
+        self._backup_task: Optional[asyncio.Future] = None
+        self._settings_hash: Optional[int] = None
+        self._cleanup_lock = asyncio.Lock()
         
         # Настройки автоотправки логов
         self.logs_settings = {
@@ -136,38 +329,102 @@ class MinecraftServerBot:
             token=config.TOKEN_BOT.get_secret_value(),
             default=DefaultBotProperties(parse_mode=ParseMode.HTML),
         )
+        # Все исходящие запросы проходят через общий ограничитель частоты
+        self.bot.session.middleware(RateLimitMiddleware())
         self.dp = Dispatcher()
         self.router = Router()
         self.dp.include_router(self.router)
         
+        # Проверка прав выполняется один раз на апдейт, до обработчиков.
+        # ID уже приведены к int при загрузке конфига, здесь только собираем множество
+        self.admin_ids: FrozenSet[int] = frozenset({config.ADMIN_ID, *config.ADMIN_IDS})
+        admin_middleware = AdminMiddleware(self.admin_ids)
+        self.router.message.middleware(admin_middleware)
+        self.router.callback_query.middleware(admin_middleware)
+        
         self._setup_handlers()
+        
+        # Статические клавиатуры строим один раз
+        self._kb_main = self._build_main_kb()
+        self._kb_control = self._build_control_kb()
+        self._kb_whitelist = self._build_whitelist_kb()
+        # Клавиатуры из одной кнопки "Назад" для сообщений об ошибках
+        self._kb_back: Dict[str, InlineKeyboardMarkup] = {
+            target: InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="↩️ Назад", callback_data=target)]])
+            for target in ("back_to_main", "whitelist_menu", "backup_settings", "logs_settings")
+        }
+        # Клавиатура удаления игроков перестраивается только при изменении белого списка
+        self._kb_remove: Optional[Tuple[Tuple[int, int], InlineKeyboardMarkup]] = None
     
-    def is_admin(self, user_id: int) -> bool:
-        """Проверяет, является ли пользователь администратором."""
-        return user_id == self.config.ADMIN_ID
-    
-    def load_whitelist(self) -> List[Dict]:
-        """Загружает белый список из файла."""
+    def load_whitelist(self) -> Dict[str, Dict]:
+        """Загружает белый список из файла (перечитывает только при изменении файла)."""
         try:
-            if self.whitelist_file.exists():
-                with open(self.whitelist_file, "r", encoding="utf-8") as f:
-                    self.whitelist_cache = json.load(f)
-            else:
-                self.whitelist_cache = []
+            try:
+                st = self.whitelist_file.stat()
+            except FileNotFoundError:
+                self.whitelist_cache = {}
+                self._wl_names_lower = set()
+                self._wl_stamp = None
+                self._wl_hash = None
+                return self.whitelist_cache
+            
+            # Размер учитываем на случай перезаписи файла в пределах одного тика mtime
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == self._wl_stamp:
+                return self.whitelist_cache
+            
+            with open(self.whitelist_file, "rb") as f:
+                raw = f.read()
+            self.whitelist_cache = {player.get("name", "Unknown"): player for player in orjson.loads(raw)}
+            self._wl_names_lower = {name.lower() for name in self.whitelist_cache}
+            self._wl_stamp = stamp
+            # Сервер форматирует файл иначе, поэтому хэшируем то, что записали бы мы сами
+            self._wl_hash = hash(self._dump_whitelist(self.whitelist_cache))
         except Exception as e:
             logger.error(f"Ошибка загрузки whitelist: {e}")
-            self.whitelist_cache = []
+            self.whitelist_cache = {}
+            self._wl_names_lower = set()
+            self._wl_stamp = None
+            self._wl_hash = None
         return self.whitelist_cache
     
-    def save_whitelist(self, whitelist: List[Dict]) -> bool:
+    @staticmethod
+    def _dump_whitelist(whitelist: Dict[str, Dict]) -> bytes:
+        """Сериализует белый список в формат файла."""
+        return orjson.dumps(list(whitelist.values()), option=orjson.OPT_INDENT_2)
+    
+    def save_whitelist(self, whitelist: Dict[str, Dict]) -> bool:
         """Сохраняет белый список в файл."""
         try:
-            with open(self.whitelist_file, "w", encoding="utf-8") as f:
-                json.dump(whitelist, f, indent=2, ensure_ascii=False)
+            data = self._dump_whitelist(whitelist)
+            data_hash = hash(data)
             self.whitelist_cache = whitelist
+            self._wl_names_lower = {name.lower() for name in whitelist}
+            
+            # Содержимое не изменилось и файл никто не трогал - не перезаписываем
+            if data_hash == self._wl_hash and self._wl_stamp is not None:
+                st = self.whitelist_file.stat()
+                if (st.st_mtime_ns, st.st_size) == self._wl_stamp:
+                    return True
+            
+            # Пишем во временный файл и атомарно подменяем основной,
+            # чтобы сбой посреди записи не испортил белый список сервера
+            tmp_file = self.whitelist_file.with_suffix(".tmp")
+            with open(tmp_file, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.whitelist_file)
+            
+            st = self.whitelist_file.stat()
+            self._wl_stamp = (st.st_mtime_ns, st.st_size)
+            self._wl_hash = data_hash
             return True
         except Exception as e:
             logger.error(f"Ошибка сохранения whitelist: {e}")
+            # Кэш мог быть изменен вызывающим кодом - перечитаем файл при следующей загрузке
+            self._wl_stamp = None
+            self._wl_hash = None
             return False
     
     def get_server_status(self) -> str:
@@ -252,11 +509,11 @@ class MinecraftServerBot:
             logger.error(f"Ошибка получения статуса сервера: {e}")
             return f"❌ <b>Ошибка получения статуса:</b> {e}"
     
-    def get_online_players_info(self) -> Tuple[int, List[str]]:
+    async def get_online_players_info(self) -> Tuple[int, List[str]]:
         """Получает информацию об онлайн игроках."""
         try:
             # Метод 1: Попробуем через RCON
-            rcon_success, rcon_result = self._try_rcon_command("list")
+            rcon_success, rcon_result = await self._try_rcon_command("list")
             if rcon_success and "RCON:" in rcon_result:
                 # Парсим ответ RCON
                 rcon_output = rcon_result.replace("RCON: ", "")
@@ -268,7 +525,6 @@ class MinecraftServerBot:
                         players_part = parts[1].strip() if len(parts) > 1 else ""
                         
                         # Извлекаем количество игроков
-                        import re
                         count_match = re.search(r'(\d+)/\d+', count_part)
                         online_count = int(count_match.group(1)) if count_match else 0
                         
@@ -281,12 +537,11 @@ class MinecraftServerBot:
             
             # Метод 2: Попробуем через анализ логов
             try:
-                logs_text = self.get_logs(100)
+                logs_text = await self.get_logs(100)
                 online_count = 0
                 players = []
                 
                 # Ищем последние сообщения о входе/выходе игроков
-                import re
                 login_pattern = r'(\w+) joined the game'
                 logout_pattern = r'(\w+) left the game'
                 
@@ -322,24 +577,27 @@ class MinecraftServerBot:
             logger.error(f"Ошибка получения информации об игроках: {e}")
             return 0, []
     
-    def execute_server_command(self, command: str) -> Tuple[bool, str]:
-        """Выполняет команду на сервере через RCON или файл команд."""
+    async def execute_server_command(self, *commands: str) -> Tuple[bool, str]:
+        """Выполняет одну или несколько команд на сервере через RCON или файл команд.
+        
+        Несколько команд отправляются подряд через одно RCON соединение.
+        """
+        command = "; ".join(commands)
         try:
             # Метод 1: Попробуем использовать RCON, если настроен
-            rcon_result = self._try_rcon_command(command)
+            rcon_result = await self._try_rcon_command(*commands)
             if rcon_result[0]:
                 return rcon_result
             
             # Метод 2: Создаем файл команд в директории бота (не в read-only директории сервера)
             command_file = Path("/app/server_commands.txt")
             try:
-                with open(command_file, "a", encoding="utf-8") as f:
-                    f.write(f"{command}\n")
-                logger.info(f"Команда записана в файл: {command}")
+                # Дописываем в потоке, чтобы медленный диск не задерживал цикл событий
+                await asyncio.to_thread(self._append_commands, command_file, commands)
                 
-                # Для systemd сервисов команды нужно отправлять через другие методы
-                # Пока что просто логируем команду
-                logger.info(f"Команда для сервера: {command}")
+                # Для systemd сервисов команды нужно отправлять через другие методы,
+                # пока что просто логируем команду
+                logger.info(f"Команда записана в файл: {command}")
                 return True, f"Команда '{command}' записана (требуется настройка RCON для прямой отправки)"
             except Exception as e:
                 logger.error(f"Ошибка записи команды в файл: {e}")
@@ -348,52 +606,103 @@ class MinecraftServerBot:
         except Exception as e:
             return False, f"Ошибка: {e}"
     
-    def _try_rcon_command(self, command: str) -> Tuple[bool, str]:
-        """Пытается выполнить команду через RCON."""
+    @staticmethod
+    def _append_commands(command_file: Path, commands: Tuple[str, ...]):
+        """Дописывает команды в файл команд."""
+        with open(command_file, "a", encoding="utf-8") as f:
+            f.write("".join(f"{c}\n" for c in commands))
+    
+    async def _try_rcon_command(self, *commands: str) -> Tuple[bool, str]:
+        """Пытается выполнить команды через RCON."""
+        # Одно соединение на всех: команды разных обработчиков не должны перемешиваться
+        async with self._rcon_lock:
+            return await self._send_rcon_commands(commands)
+    
+    async def _send_rcon_commands(self, commands: Tuple[str, ...]) -> Tuple[bool, str]:
+        """Отправляет команды через сохраненное RCON соединение, при необходимости подключаясь заново."""
         try:
             # Проверяем, есть ли настройки RCON в server.properties
             if not self.server_properties.exists():
                 return False, "server.properties не найден"
             
-            # Читаем настройки RCON
-            rcon_enabled = False
-            rcon_port = 25575
-            rcon_password = ""
-            
-            with open(self.server_properties, "r", encoding="utf-8") as f:
-                for line in f:
+            # Читаем настройки RCON только если server.properties изменился
+            mtime_ns = self.server_properties.stat().st_mtime_ns
+            if self._rcon_cfg_cache and self._rcon_cfg_cache[0] == mtime_ns:
+                _, rcon_enabled, rcon_port, rcon_password = self._rcon_cfg_cache
+            else:
+                props = {}
+                for line in self.server_properties.read_text(encoding="utf-8").splitlines():
                     line = line.strip()
-                    if line.startswith("enable-rcon=true"):
-                        rcon_enabled = True
-                    elif line.startswith("rcon.port="):
-                        rcon_port = int(line.split("=")[1])
-                    elif line.startswith("rcon.password="):
-                        rcon_password = line.split("=", 1)[1]
+                    if not line or line.startswith("#") or "=" not in line:
+                        continue
+                    key, value = line.split("=", 1)
+                    props[key] = value
+                
+                rcon_enabled = props.get("enable-rcon") == "true"
+                rcon_port = int(props.get("rcon.port") or 25575)
+                rcon_password = props.get("rcon.password", "")
+                
+                self._rcon_cfg_cache = (mtime_ns, rcon_enabled, rcon_port, rcon_password)
             
             if not rcon_enabled or not rcon_password:
                 return False, "RCON не настроен"
             
-            # Используем RCON библиотеку
+            # Используем асинхронную RCON библиотеку, чтобы не блокировать цикл событий
             try:
-                from mcrcon import MCRcon
-                with MCRcon("localhost", rcon_password, port=rcon_port) as mcr:
-                    response = mcr.command(command)
-                    logger.info(f"RCON команда выполнена: {command} -> {response}")
-                    return True, f"RCON: {response}"
+                from aiomcrcon import Client
             except ImportError:
                 return False, "RCON библиотека не установлена"
-            except Exception as rcon_error:
-                return False, f"Ошибка RCON соединения: {rcon_error}"
+            
+            # Переподключаемся, если настройки RCON поменялись
+            if self._rcon and (self._rcon.port, self._rcon.password) != (rcon_port, rcon_password):
+                await self._close_rcon()
+            
+            responses = []
+            while True:
+                reused = self._rcon is not None
+                try:
+                    if self._rcon is None:
+                        self._rcon = Client("localhost", rcon_port, rcon_password)
+                        await self._rcon.connect(timeout=5)
+                    # После переподключения продолжаем с команды, на которой оборвалось
+                    for command in commands[len(responses):]:
+                        response, _ = await self._rcon.send_cmd(command, timeout=5)
+                        logger.info(f"RCON команда выполнена: {command} -> {response}")
+                        responses.append(response)
+                    return True, "RCON: " + "\n".join(responses)
+                except Exception as rcon_error:
+                    await self._close_rcon()
+                    # Сохраненное соединение могло устареть (например, после перезапуска сервера)
+                    if not reused:
+                        return False, f"Ошибка RCON соединения: {rcon_error}"
             
         except Exception as e:
             return False, f"Ошибка RCON: {e}"
     
+    async def _close_rcon(self):
+        """Закрывает сохраненное RCON соединение."""
+        if self._rcon:
+            rcon, self._rcon = self._rcon, None
+            try:
+                await rcon.close()
+            except Exception:
+                pass
+    
     def save_backup_settings(self) -> bool:
         """Сохраняет настройки автобэкапов в файл."""
         try:
             settings_file = ROOT_DIR / "backup_settings.json"
-            with open(settings_file, "w", encoding="utf-8") as f:
-                json.dump(self.backup_settings, f, indent=2, ensure_ascii=False)
+            data = orjson.dumps(self.backup_settings, option=orjson.OPT_INDENT_2)
+            data_hash = hash(data)
+            # Настройки не изменились - файл не перезаписываем
+            if data_hash == self._settings_hash:
+                return True
+            
+            # Пишем во временный файл и атомарно подменяем основной
+            tmp_file = settings_file.with_suffix(".tmp")
+            tmp_file.write_bytes(data)
+            os.replace(tmp_file, settings_file)
+            self._settings_hash = data_hash
             return True
         except Exception as e:
             logger.error(f"Ошибка сохранения настроек бэкапа: {e}")
@@ -404,8 +713,10 @@ class MinecraftServerBot:
         try:
             settings_file = ROOT_DIR / "backup_settings.json"
             if settings_file.exists():
-                with open(settings_file, "r", encoding="utf-8") as f:
-                    self.backup_settings = json.load(f)
+                with open(settings_file, "rb") as f:
+                    data = f.read()
+                self.backup_settings = orjson.loads(data)
+                self._settings_hash = hash(data)
                 return True
             return False
         except Exception as e:
@@ -416,8 +727,8 @@ class MinecraftServerBot:
         """Сохраняет настройки автоотправки логов в файл."""
         try:
             settings_file = ROOT_DIR / "logs_settings.json"
-            with open(settings_file, "w", encoding="utf-8") as f:
-                json.dump(self.logs_settings, f, indent=2, ensure_ascii=False)
+            with open(settings_file, "wb") as f:
+                f.write(orjson.dumps(self.logs_settings, option=orjson.OPT_INDENT_2))
             return True
         except Exception as e:
             logger.error(f"Ошибка сохранения настроек логов: {e}")
@@ -428,8 +739,8 @@ class MinecraftServerBot:
         try:
             settings_file = ROOT_DIR / "logs_settings.json"
             if settings_file.exists():
-                with open(settings_file, "r", encoding="utf-8") as f:
-                    self.logs_settings = json.load(f)
+                with open(settings_file, "rb") as f:
+                    self.logs_settings = orjson.loads(f.read())
                 return True
             return False
         except Exception as e:
@@ -439,17 +750,27 @@ class MinecraftServerBot:
     def cleanup_old_backups(self):
         """Удаляет старые бэкапы, оставляя только указанное количество."""
         try:
-            backup_files = list(self.backup_dir.glob("world_backup_*.tar.gz"))
-            backup_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
+            # Один проход scandir: время изменения собираем сразу, без stat() при сортировке
+            with os.scandir(self.backup_dir) as it:
+                backup_files = [
+                    (entry.stat().st_mtime, entry.path, entry.name)
+                    for entry in it
+                    if entry.name.startswith("world_backup_") and ".tar." in entry.name
+                ]
+            backup_files.sort(reverse=True)
             
             keep_count = self.backup_settings.get("keep_count", 7)
-            if len(backup_files) > keep_count:
-                for old_backup in backup_files[keep_count:]:
-                    old_backup.unlink()
-                    logger.info(f"Удален старый бэкап: {old_backup.name}")
+            for _, path, name in backup_files[keep_count:]:
+                os.unlink(path)
+                logger.info(f"Удален старый бэкап: {name}")
         except Exception as e:
             logger.error(f"Ошибка очистки старых бэкапов: {e}")
     
+    async def _cleanup_old_backups_async(self):
+        """Удаляет старые бэкапы в отдельном потоке, не допуская параллельных очисток."""
+        async with self._cleanup_lock:
+            await asyncio.to_thread(self.cleanup_old_backups)
+    
     def create_logs_archive(self) -> Tuple[bool, str, Optional[Path]]:
         """Создает архив с логами сервера."""
         try:
@@ -487,24 +808,25 @@ class MinecraftServerBot:
                         tar.add(log_file, arcname=log_file.name)
                         log_files_to_archive.append(str(log_file.name))
                 
-                # Добавляем логи из systemd journal
+                # Добавляем логи из systemd journal.
+                # Журнал может быть большим, поэтому пишем его сразу в файл, минуя память
+                journal_file = Path("/app") / f"systemd_journal_{timestamp}.log"
                 try:
-                    journal_result = subprocess.run(
-                        ["journalctl", "-u", self.config.SERVER_SERVICE, "--no-pager", "-o", "short"],
-                        capture_output=True,
-                        text=True,
-                        timeout=30
-                    )
+                    with open(journal_file, "wb") as f:
+                        journal_result = subprocess.run(
+                            ["journalctl", "-u", self.config.SERVER_SERVICE, "--no-pager", "-o", "short"],
+                            stdout=f,
+                            stderr=subprocess.DEVNULL,
+                            timeout=30
+                        )
                     
-                    if journal_result.returncode == 0 and journal_result.stdout.strip():
-                        journal_file = Path("/app") / f"systemd_journal_{timestamp}.log"
-                        with open(journal_file, "w", encoding="utf-8") as f:
-                            f.write(journal_result.stdout)
+                    if journal_result.returncode == 0 and journal_file.stat().st_size > 0:
                         tar.add(journal_file, arcname=journal_file.name)
-                        journal_file.unlink()  # Удаляем временный файл
                         log_files_to_archive.append("systemd journal")
                 except Exception as e:
                     logger.error(f"Ошибка получения журнала systemd: {e}")
+                finally:
+                    journal_file.unlink(missing_ok=True)  # Удаляем временный файл
             
             if not log_files_to_archive:
                 return False, "Файлы логов не найдены", None
@@ -518,18 +840,17 @@ class MinecraftServerBot:
         """Задача автоматической отправки логов."""
         try:
             logger.info("Выполняется автоматическая отправка логов...")
-            success, result, logs_path = self.create_logs_archive()
+            success, result, logs_path = await asyncio.to_thread(self.create_logs_archive)
             
             if success and logs_path:
                 # Отправляем в чат для логов
                 try:
                     chat_id = self.logs_settings.get("chat_id", self.config.BACKUP_CHAT_ID)
-                    with open(logs_path, "rb") as file:
-                        await self.bot.send_document(
-                            chat_id=chat_id,
-                            document=types.BufferedInputFile(file.read(), filename=logs_path.name),
-                            caption=f"📋 Автоматическая отправка логов сервера\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{result}",
-                        )
+                    await self.bot.send_document(
+                        chat_id=chat_id,
+                        document=types.FSInputFile(logs_path, filename=logs_path.name, chunk_size=UPLOAD_CHUNK_SIZE),
+                        caption=f"📋 Автоматическая отправка логов сервера\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{result}",
+                    )
                     
                     # Удаляем временный файл
                     logs_path.unlink()
@@ -577,27 +898,32 @@ class MinecraftServerBot:
         except Exception as e:
             logger.error(f"Ошибка настройки автоотправки логов: {e}")
     
+    async def _send_backup(self, backup_path: Path, title: str):
+        """Отправляет архив бэкапа в чат для бэкапов."""
+        await self.bot.send_document(
+            chat_id=self.config.BACKUP_CHAT_ID,
+            document=types.FSInputFile(backup_path, filename=backup_path.name, chunk_size=UPLOAD_CHUNK_SIZE),
+            caption=f"{title}\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        )
+    
     async def auto_backup_task(self):
         """Задача автоматического бэкапа."""
         try:
             logger.info("Выполняется автоматический бэкап...")
-            success, result, backup_path = self.create_backup()
+            success, result, backup_path = await self.create_backup()
             
             if success and backup_path:
-                # Очищаем старые бэкапы
-                self.cleanup_old_backups()
+                # Очищаем старые бэкапы параллельно с отправкой
+                cleanup_task = asyncio.create_task(self._cleanup_old_backups_async())
                 
                 # Отправляем в чат для бэкапов
                 try:
-                    with open(backup_path, "rb") as file:
-                        await self.bot.send_document(
-                            chat_id=self.config.BACKUP_CHAT_ID,
-                            document=types.BufferedInputFile(file.read(), filename=backup_path.name),
-                            caption=f"🤖 Автоматический бэкап мира Minecraft\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                        )
+                    await self._send_backup(backup_path, "🤖 Автоматический бэкап мира Minecraft")
                     logger.info(f"Автобэкап успешно создан и отправлен: {backup_path.name}")
                 except Exception as e:
                     logger.error(f"Ошибка отправки автобэкапа: {e}")
+                finally:
+                    await cleanup_task
             else:
                 logger.error(f"Ошибка создания автобэкапа: {result}")
         except Exception as e:
@@ -701,7 +1027,10 @@ class MinecraftServerBot:
         for interval_key, interval_name in intervals:
             current = "✅ " if self.backup_settings.get("interval") == interval_key else ""
             builder.row(
-                InlineKeyboardButton(text=f"{current}{interval_name}", callback_data=f"interval_{interval_key}")
+                InlineKeyboardButton(
+                    text=f"{current}{interval_name}",
+                    callback_data=BackupIntervalCallback(interval=interval_key).pack(),
+                )
             )
         
         builder.row(
@@ -826,24 +1155,157 @@ class MinecraftServerBot:
         
         return text
     
-    def get_server_info(self) -> str:
+    async def _run(self, *args: str, timeout: Optional[float] = 10) -> Tuple[int, str, str]:
+        """Запускает внешнюю команду, не блокируя цикл событий."""
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        return proc.returncode, stdout.decode(errors="ignore"), stderr.decode(errors="ignore")
+    
+    async def _systemctl(self, action: str):
+        """Выполняет systemctl start/stop/restart для сервиса сервера."""
+        # Без таймаута: остановка сервера с сохранением мира может занять время,
+        # но цикл событий при этом не блокируется
+        returncode, _, stderr = await self._run("systemctl", action, self.config.SERVER_SERVICE, timeout=None)
+        if returncode != 0:
+            raise RuntimeError(stderr.strip() or f"systemctl {action} завершился с кодом {returncode}")
+    
+    async def _wait_for_service(self, active: bool, timeout: float = 10) -> bool:
+        """Ждет, пока сервис станет активным (или неактивным), опрашивая systemctl каждые 0.5 с."""
+        deadline = monotonic() + timeout
+        while True:
+            returncode, _, _ = await self._run(
+                "systemctl", "is-active", "--quiet", self.config.SERVER_SERVICE, timeout=5
+            )
+            if (returncode == 0) == active:
+                return True
+            if monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.5)
+    
+    async def _delayed_server_action(self, action: str, warning: str, message: Message):
+        """Предупреждает игроков, через 10 секунд выполняет systemctl action и обновляет статус в сообщении."""
+        try:
+            await self.execute_server_command(f"say {warning}")
+            await asyncio.sleep(10)
+            
+            await self._systemctl(action)
+            # Вместо фиксированной паузы ждем нужного состояния сервиса, но не дольше 10 секунд
+            await self._wait_for_service(active=action != "stop")
+            self._invalidate_cache()
+            await self._replace_message(message, await self._get_status_cached(), self.get_control_keyboard())
+        except Exception as e:
+            logger.error(f"Ошибка выполнения systemctl {action}: {e}")
+            try:
+                await self._replace_message(message, f"❌ Ошибка: {e}", self.get_control_keyboard())
+            except Exception:
+                pass
+    
+    def _schedule_server_action(self, action: str, warning: str, message: Message) -> bool:
+        """Запускает отложенное действие в фоне. Возвращает False, если другое еще не завершилось."""
+        if self._server_action_task and not self._server_action_task.done():
+            return False
+        self._server_action_task = asyncio.create_task(
+            self._delayed_server_action(action, warning, message)
+        )
+        return True
+    
+    async def _cached(self, key: str, ttl: float, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Возвращает результат fn() из кэша, если он получен не раньше ttl секунд назад."""
+        now = monotonic()
+        entry = self._cache.get(key)
+        if entry is None or now - entry[0] >= ttl:
+            # Храним саму задачу, чтобы одновременные нажатия ждали один и тот же вызов
+            entry = (now, asyncio.ensure_future(fn()))
+            self._cache[key] = entry
+        
+        try:
+            return await asyncio.shield(entry[1])
+        except Exception:
+            # Ошибки не кэшируем
+            if self._cache.get(key) is entry:
+                del self._cache[key]
+            raise
+    
+    def _invalidate_cache(self):
+        """Сбрасывает кэш статуса после изменения состояния сервера."""
+        self._cache.clear()
+    
+    async def _get_status_cached(self) -> str:
+        return await self._cached("status", 3.0, lambda: asyncio.to_thread(self.get_server_status))
+    
+    async def _get_info_cached(self) -> str:
+        return await self._cached("info", 10.0, self.get_server_info)
+    
+    @staticmethod
+    def _unwrap(result):
+        """Возвращает результат из asyncio.gather или пробрасывает сохраненное исключение."""
+        if isinstance(result, BaseException):
+            raise result
+        return result
+    
+    async def _get_java_version(self) -> str:
+        """Получает версию Java (кэшируется: без перезапуска бота она не меняется)."""
+        if self._java_version is not None:
+            return self._java_version
+        
+        try:
+            returncode, stdout, stderr = await self._run("java", "-version", timeout=5)
+            if returncode == 0:
+                # Java выводит версию в stderr, поэтому используем stderr
+                java_output = stderr if stderr else stdout
+                # Извлекаем только версию из первой строки
+                version_line = java_output.strip().split("\n")[0]
+                if 'version' in version_line:
+                    version = version_line.split('version')[1].strip().strip('"')
+                else:
+                    version = version_line
+            else:
+                version = "Не установлена"
+        except FileNotFoundError:
+            version = "Не найдена"
+        except Exception as e:
+            # Ошибки (например, таймаут) не кэшируем - попробуем в следующий раз
+            logger.error(f"Ошибка получения информации о Java: {e}")
+            return "Ошибка проверки"
+        
+        self._java_version = version
+        return version
+    
+    async def get_server_info(self) -> str:
         """Получает детальную информацию о сервере."""
-        info_lines = [self.get_server_status()]
+        # Внешние команды независимы, поэтому запускаем их параллельно.
+        # Остальное читаем напрямую из /proc и os, без запуска процессов
+        status_text, cpu_info, java_version = await asyncio.gather(
+            asyncio.to_thread(self.get_server_status),
+            self._run("lscpu", timeout=5),
+            self._get_java_version(),
+            return_exceptions=True
+        )
+        info_lines = [self._unwrap(status_text)]
         
         try:
             # Информация о CPU
             try:
                 # Количество ядер
-                cpu_cores = subprocess.run(["nproc"], capture_output=True, text=True, timeout=5)
-                cores_count = cpu_cores.stdout.strip() if cpu_cores.returncode == 0 else "N/A"
+                cores_num = len(os.sched_getaffinity(0))
+                cores_count = str(cores_num)
                 
                 # Информация о процессоре
-                cpu_info = subprocess.run(["lscpu"], capture_output=True, text=True, timeout=5)
+                returncode, stdout, _ = self._unwrap(cpu_info)
                 cpu_model = "N/A"
                 cpu_freq = "N/A"
                 
-                if cpu_info.returncode == 0:
-                    for line in cpu_info.stdout.split('\n'):
+                if returncode == 0:
+                    for line in stdout.split('\n'):
                         if 'Model name:' in line:
                             cpu_model = line.split(':', 1)[1].strip()
                         elif 'CPU MHz:' in line:
@@ -851,17 +1313,9 @@ class MinecraftServerBot:
                             cpu_freq = f"{freq_mhz/1000:.2f} GHz"
                 
                 # Загрузка CPU
-                cpu_load = subprocess.run(["cat", "/proc/loadavg"], capture_output=True, text=True, timeout=5)
-                load_avg = "N/A"
-                if cpu_load.returncode == 0:
-                    load_parts = cpu_load.stdout.strip().split()
-                    if len(load_parts) >= 3:
-                        load_1m = float(load_parts[0])
-                        load_5m = float(load_parts[1])
-                        load_15m = float(load_parts[2])
-                        cores_num = int(cores_count) if cores_count != "N/A" else 1
-                        load_percent = (load_1m / cores_num) * 100
-                        load_avg = f"{load_1m:.2f} ({load_percent:.1f}%)"
+                load_1m, load_5m, load_15m = os.getloadavg()
+                load_percent = (load_1m / cores_num) * 100
+                load_avg = f"{load_1m:.2f} ({load_percent:.1f}%)"
                 
                 info_lines.append(f"<b>💻 CPU:</b> {cpu_model}")
                 info_lines.append(f"<b>🔧 Ядер:</b> {cores_count} @ {cpu_freq}")
@@ -873,108 +1327,70 @@ class MinecraftServerBot:
             
             # Детальная информация о памяти
             try:
-                memory_result = subprocess.run(["free", "-b"], capture_output=True, text=True, timeout=5)
-                if memory_result.returncode == 0:
-                    memory_lines = memory_result.stdout.strip().split("\n")
-                    if len(memory_lines) > 1:
-                        mem_data = memory_lines[1].split()
-                        if len(mem_data) >= 7:
-                            total_bytes = int(mem_data[1])
-                            used_bytes = int(mem_data[2])
-                            free_bytes = int(mem_data[3])
-                            available_bytes = int(mem_data[6])
-                            
-                            # Конвертируем в удобные единицы
-                            total_gb = total_bytes / (1024**3)
-                            used_gb = used_bytes / (1024**3)
-                            available_gb = available_bytes / (1024**3)
-                            used_percent = (used_bytes / total_bytes) * 100
-                            
-                            info_lines.append(f"<b>🧠 ОЗУ:</b> {used_gb:.1f}GB / {total_gb:.1f}GB ({used_percent:.1f}%)")
-                            info_lines.append(f"<b>💾 Доступно:</b> {available_gb:.1f}GB")
-                        else:
-                            info_lines.append(f"<b>🧠 ОЗУ:</b> Ошибка парсинга данных")
-                    else:
-                        info_lines.append(f"<b>🧠 ОЗУ:</b> Недоступно")
+                meminfo = {}
+                for line in Path("/proc/meminfo").read_text().splitlines():
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        meminfo[key] = value
+                
+                if "MemTotal" in meminfo and "MemAvailable" in meminfo:
+                    # Значения в /proc/meminfo указаны в кБ
+                    total_bytes = int(meminfo["MemTotal"].split()[0]) * 1024
+                    available_bytes = int(meminfo["MemAvailable"].split()[0]) * 1024
+                    used_bytes = total_bytes - available_bytes
+                    
+                    # Конвертируем в удобные единицы
+                    total_gb = total_bytes / (1024**3)
+                    used_gb = used_bytes / (1024**3)
+                    available_gb = available_bytes / (1024**3)
+                    used_percent = (used_bytes / total_bytes) * 100
+                    
+                    info_lines.append(f"<b>🧠 ОЗУ:</b> {used_gb:.1f}GB / {total_gb:.1f}GB ({used_percent:.1f}%)")
+                    info_lines.append(f"<b>💾 Доступно:</b> {available_gb:.1f}GB")
                 else:
-                    info_lines.append(f"<b>🧠 ОЗУ:</b> Ошибка получения")
+                    info_lines.append(f"<b>🧠 ОЗУ:</b> Ошибка парсинга данных")
             except Exception as e:
                 logger.error(f"Ошибка получения информации о памяти: {e}")
                 info_lines.append(f"<b>🧠 ОЗУ:</b> Ошибка получения данных")
             
             # Детальная информация о диске
             try:
-                disk_result = subprocess.run(["df", "-B1", "/server"], capture_output=True, text=True, timeout=5)
-                if disk_result.returncode == 0:
-                    disk_lines = disk_result.stdout.strip().split("\n")
-                    if len(disk_lines) > 1:
-                        disk_data = disk_lines[1].split()
-                        if len(disk_data) >= 6:
-                            total_bytes = int(disk_data[1])
-                            used_bytes = int(disk_data[2])
-                            available_bytes = int(disk_data[3])
-                            used_percent = float(disk_data[4].replace('%', ''))
-                            
-                            # Конвертируем в удобные единицы
-                            if total_bytes >= 1024**4:  # TB
-                                total_size = f"{total_bytes / (1024**4):.1f}TB"
-                                used_size = f"{used_bytes / (1024**4):.1f}TB"
-                                available_size = f"{available_bytes / (1024**4):.1f}TB"
-                            elif total_bytes >= 1024**3:  # GB
-                                total_size = f"{total_bytes / (1024**3):.1f}GB"
-                                used_size = f"{used_bytes / (1024**3):.1f}GB"
-                                available_size = f"{available_bytes / (1024**3):.1f}GB"
-                            else:  # MB
-                                total_size = f"{total_bytes / (1024**2):.1f}MB"
-                                used_size = f"{used_bytes / (1024**2):.1f}MB"
-                                available_size = f"{available_bytes / (1024**2):.1f}MB"
-                            
-                            info_lines.append(f"<b>💽 Диск:</b> {used_size} / {total_size} ({used_percent:.1f}%)")
-                            info_lines.append(f"<b>📁 Свободно:</b> {available_size}")
-                        else:
-                            info_lines.append(f"<b>💽 Диск:</b> Ошибка парсинга данных")
-                    else:
-                        info_lines.append(f"<b>💽 Диск:</b> Недоступно")
-                else:
-                    info_lines.append(f"<b>💽 Диск:</b> Ошибка получения")
+                disk = os.statvfs("/server")
+                total_bytes = disk.f_blocks * disk.f_frsize
+                used_bytes = (disk.f_blocks - disk.f_bfree) * disk.f_frsize
+                available_bytes = disk.f_bavail * disk.f_frsize
+                # Процент считаем как df: от места, доступного пользователю
+                used_percent = used_bytes / (used_bytes + available_bytes) * 100 if total_bytes else 0.0
+                
+                # Конвертируем в удобные единицы
+                if total_bytes >= 1024**4:  # TB
+                    total_size = f"{total_bytes / (1024**4):.1f}TB"
+                    used_size = f"{used_bytes / (1024**4):.1f}TB"
+                    available_size = f"{available_bytes / (1024**4):.1f}TB"
+                elif total_bytes >= 1024**3:  # GB
+                    total_size = f"{total_bytes / (1024**3):.1f}GB"
+                    used_size = f"{used_bytes / (1024**3):.1f}GB"
+                    available_size = f"{available_bytes / (1024**3):.1f}GB"
+                else:  # MB
+                    total_size = f"{total_bytes / (1024**2):.1f}MB"
+                    used_size = f"{used_bytes / (1024**2):.1f}MB"
+                    available_size = f"{available_bytes / (1024**2):.1f}MB"
+                
+                info_lines.append(f"<b>💽 Диск:</b> {used_size} / {total_size} ({used_percent:.1f}%)")
+                info_lines.append(f"<b>📁 Свободно:</b> {available_size}")
             except Exception as e:
                 logger.error(f"Ошибка получения информации о диске: {e}")
                 info_lines.append(f"<b>💽 Диск:</b> Ошибка получения данных")
             
             # Ядро системы
             try:
-                kernel_result = subprocess.run(["uname", "-r"], capture_output=True, text=True, timeout=5)
-                if kernel_result.returncode == 0:
-                    kernel = kernel_result.stdout.strip()
-                    info_lines.append(f"<b>🐧 Ядро:</b> {kernel}")
-                else:
-                    info_lines.append(f"<b>🐧 Ядро:</b> Недоступно")
+                info_lines.append(f"<b>🐧 Ядро:</b> {os.uname().release}")
             except Exception as e:
                 logger.error(f"Ошибка получения информации о ядре: {e}")
                 info_lines.append(f"<b>🐧 Ядро:</b> Ошибка получения")
             
             # Java версия
-            try:
-                java = subprocess.run(["java", "-version"], capture_output=True, text=True, timeout=5)
-                if java.returncode == 0:
-                    # Java выводит версию в stderr, поэтому используем stderr
-                    java_output = java.stderr if java.stderr else java.stdout
-                    java_lines = java_output.strip().split("\n")
-                    if java_lines:
-                        # Извлекаем только версию из первой строки
-                        version_line = java_lines[0]
-                        if 'version' in version_line:
-                            version_part = version_line.split('version')[1].strip().strip('"')
-                            info_lines.append(f"<b>☕ Java:</b> {version_part}")
-                        else:
-                            info_lines.append(f"<b>☕ Java:</b> {version_line}")
-                else:
-                    info_lines.append(f"<b>☕ Java:</b> Не установлена")
-            except FileNotFoundError:
-                info_lines.append(f"<b>☕ Java:</b> Не найдена")
-            except Exception as e:
-                logger.error(f"Ошибка получения информации о Java: {e}")
-                info_lines.append(f"<b>☕ Java:</b> Ошибка проверки")
+            info_lines.append(f"<b>☕ Java:</b> {self._unwrap(java_version)}")
             
             # Белый список
             try:
@@ -996,31 +1412,77 @@ class MinecraftServerBot:
         
         return "\n".join(info_lines)
     
-    def get_logs(self, lines: int = 50) -> str:
+    @staticmethod
+    def _tail_file(path: Path, lines: int, max_bytes: Optional[int] = None) -> str:
+        """Читает последние строки файла (не больше max_bytes с конца), не загружая его целиком."""
+        size = path.stat().st_size
+        window = lines * 512
+        if max_bytes is not None:
+            window = min(window, max_bytes)
+        with open(path, "rb") as f:
+            # Если строки длиннее ожидаемого, расширяем окно один раз
+            for _ in range(2):
+                f.seek(max(0, size - window))
+                tail = f.read().decode("utf-8", errors="ignore").splitlines()
+                if len(tail) > lines or window >= size or (max_bytes is not None and window >= max_bytes):
+                    break
+                window *= 2
+        return "\n".join(tail[-lines:])
+    
+    async def get_logs(self, lines: int = 50, max_chars: Optional[int] = None) -> str:
+        """Получает последние строки логов; max_chars ограничивает длину результата с конца."""
+        # В UTF-8 символ занимает не больше 4 байт, поэтому файлы читаем не дальше max_chars * 4 с конца
+        logs_text = await self._read_logs(lines, None if max_chars is None else max_chars * 4)
+        if max_chars is not None and len(logs_text) > max_chars:
+            logs_text = logs_text[-max_chars:]
+        return logs_text
+    
+    async def _read_logs(self, lines: int, max_bytes: Optional[int]) -> str:
         """Получает последние строки логов из разных источников."""
         try:
             # Метод 1: Пробуем получить логи из systemd journal
             try:
-                result = subprocess.run(
-                    ["journalctl", "-u", self.config.SERVER_SERVICE, "-n", str(lines), "--no-pager"],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
+                # -o cat отдает только текст сообщений
+                proc = await asyncio.create_subprocess_exec(
+                    "journalctl", "-u", self.config.SERVER_SERVICE, "-n", str(lines), "--no-pager", "-o", "cat",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL
                 )
                 
-                if result.returncode == 0 and result.stdout.strip() and "-- No entries --" not in result.stdout:
-                    return result.stdout.strip()
+                async def read_tail() -> Tuple[bytes, bool]:
+                    # Вывод читаем до конца, но храним только последние 64 КиБ - самые свежие строки
+                    limit = 64 * 1024
+                    tail = bytearray()
+                    truncated = False
+                    while chunk := await proc.stdout.read(limit):
+                        tail += chunk
+                        if len(tail) > limit:
+                            del tail[:-limit]
+                            truncated = True
+                    return bytes(tail), truncated
+                
+                try:
+                    data, truncated = await asyncio.wait_for(read_tail(), 10)
+                finally:
+                    if proc.returncode is None:
+                        proc.kill()
+                    returncode = await proc.wait()
+                
+                if truncated:
+                    # Первая строка обрезана посередине - отбрасываем ее
+                    data = data.partition(b"\n")[2]
+                stdout = data.decode(errors="ignore")
+                if returncode == 0 and stdout.strip() and "-- No entries --" not in stdout:
+                    return stdout.strip()
             except Exception as e:
                 logger.error(f"Ошибка получения логов через journalctl: {e}")
             
             # Метод 2: Пробуем файл логов сервера
             try:
                 if self.server_log.exists():
-                    with open(self.server_log, "r", encoding="utf-8", errors="ignore") as f:
-                        all_lines = f.readlines()
-                        last_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                        if last_lines:
-                            return "".join(last_lines)
+                    last_lines = await asyncio.to_thread(self._tail_file, self.server_log, lines, max_bytes)
+                    if last_lines:
+                        return last_lines
             except Exception as e:
                 logger.error(f"Ошибка чтения файла логов: {e}")
             
@@ -1034,25 +1496,21 @@ class MinecraftServerBot:
             for log_file in possible_log_files:
                 try:
                     if log_file.exists():
-                        with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-                            all_lines = f.readlines()
-                            last_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                            if last_lines:
-                                return f"Логи из {log_file.name}:\n" + "".join(last_lines)
+                        last_lines = await asyncio.to_thread(self._tail_file, log_file, lines, max_bytes)
+                        if last_lines:
+                            return f"Логи из {log_file.name}:\n" + last_lines
                 except Exception as e:
                     logger.error(f"Ошибка чтения {log_file}: {e}")
             
             # Метод 4: Пробуем получить логи через systemctl status
             try:
-                result = subprocess.run(
-                    ["systemctl", "status", self.config.SERVER_SERVICE, "-n", str(min(lines, 20))],
-                    capture_output=True,
-                    text=True,
+                returncode, stdout, _ = await self._run(
+                    "systemctl", "status", self.config.SERVER_SERVICE, "-n", str(min(lines, 20)),
                     timeout=10
                 )
                 
-                if result.returncode in [0, 3] and result.stdout.strip():  # 3 = inactive but ok
-                    return f"Статус сервиса:\n{result.stdout.strip()}"
+                if returncode in [0, 3] and stdout.strip():  # 3 = inactive but ok
+                    return f"Статус сервиса:\n{stdout.strip()}"
             except Exception as e:
                 logger.error(f"Ошибка получения статуса сервиса: {e}")
             
@@ -1062,30 +1520,74 @@ class MinecraftServerBot:
                    "• Проблемы с доступом к файлам логов\n\n" \
                    "Попробуйте запустить сервер или проверить его статус."
                    
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return "Таймаут получения логов"
         except Exception as e:
             return f"Ошибка получения логов: {e}"
     
-    def create_backup(self) -> Tuple[bool, str, Optional[Path]]:
-        """Создает резервную копию мира."""
+    @staticmethod
+    def _backup_filter(tarinfo: tarfile.TarInfo) -> Optional[tarfile.TarInfo]:
+        """Исключает из бэкапа файлы, которые Minecraft пересоздает сам."""
+        name = os.path.basename(tarinfo.name)
+        if any(fnmatch.fnmatch(name, pattern) for pattern in BACKUP_EXCLUDE_PATTERNS):
+            return None
+        return tarinfo
+    
+    @staticmethod
+    def _create_backup_archive(backup_path: Path, world_dir: Path) -> None:
+        """Упаковывает мир средствами tarfile (запасной вариант без zstd и pigz)."""
+        with tarfile.open(backup_path, "w:gz") as tar:
+            tar.add(world_dir, arcname="world", filter=MinecraftServerBot._backup_filter)
+    
+    async def create_backup(self) -> Tuple[bool, str, Optional[Path]]:
+        """Создает резервную копию мира. Одновременные вызовы получают результат одного бэкапа."""
+        # Второй архив параллельно с первым только удвоит нагрузку на диск
+        if self._backup_task is None or self._backup_task.done():
+            self._backup_task = asyncio.ensure_future(self._make_backup())
+        return await asyncio.shield(self._backup_task)
+    
+    async def _make_backup(self) -> Tuple[bool, str, Optional[Path]]:
+        """Архивирует директорию мира."""
         try:
             world_dir = self.server_dir / "world"
             if not world_dir.exists():
                 return False, "Директория мира не найдена", None
             
+            # zstd -3 сжимает не хуже gzip и в разы быстрее; -T0 - на всех ядрах.
+            # Без zstd используем pigz, а без него - tarfile в отдельном потоке
+            if shutil.which("zstd"):
+                compressor, extension = "zstd -T0 -3", "tar.zst"
+            elif shutil.which("pigz"):
+                compressor, extension = "pigz", "tar.gz"
+            else:
+                compressor, extension = None, "tar.gz"
+            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"world_backup_{timestamp}.tar.gz"
+            backup_name = f"world_backup_{timestamp}.{extension}"
             backup_path = self.backup_dir / backup_name
             
-            with tarfile.open(backup_path, "w:gz") as tar:
-                tar.add(world_dir, arcname="world")
+            if compressor:
+                # Сжатие идет во внешних процессах и не блокирует бота
+                returncode, _, stderr = await self._run(
+                    "tar", "-I", compressor, "-cf", str(backup_path),
+                    *(f"--exclude={pattern}" for pattern in BACKUP_EXCLUDE_PATTERNS),
+                    "-C", str(self.server_dir), "world",
+                    timeout=None
+                )
+                # Код 1 означает, что файлы менялись во время чтения - архив при этом создан
+                if returncode == 1:
+                    logger.warning(f"Мир изменялся во время создания бэкапа: {stderr.strip()}")
+                elif returncode != 0:
+                    backup_path.unlink(missing_ok=True)
+                    return False, f"Ошибка создания бэкапа: {stderr.strip()}", None
+            else:
+                await asyncio.to_thread(self._create_backup_archive, backup_path, world_dir)
             
             return True, f"Бэкап создан: {backup_name}", backup_path
         except Exception as e:
             return False, f"Ошибка создания бэкапа: {e}", None
     
-    def get_main_keyboard(self) -> InlineKeyboardMarkup:
+    def _build_main_kb(self) -> InlineKeyboardMarkup:
         """Создает основную клавиатуру."""
         builder = InlineKeyboardBuilder()
         
@@ -1112,7 +1614,7 @@ class MinecraftServerBot:
         
         return builder.as_markup()
     
-    def get_control_keyboard(self) -> InlineKeyboardMarkup:
+    def _build_control_kb(self) -> InlineKeyboardMarkup:
         """Создает клавиатуру для управления сервером."""
         builder = InlineKeyboardBuilder()
         
@@ -1142,7 +1644,7 @@ class MinecraftServerBot:
         
         return builder.as_markup()
     
-    def get_whitelist_keyboard(self) -> InlineKeyboardMarkup:
+    def _build_whitelist_kb(self) -> InlineKeyboardMarkup:
         """Создает клавиатуру для управления белым списком."""
         builder = InlineKeyboardBuilder()
         
@@ -1162,15 +1664,110 @@ class MinecraftServerBot:
         
         return builder.as_markup()
     
+    def get_main_keyboard(self) -> InlineKeyboardMarkup:
+        """Возвращает основную клавиатуру."""
+        return self._kb_main
+    
+    def get_control_keyboard(self) -> InlineKeyboardMarkup:
+        """Возвращает клавиатуру для управления сервером."""
+        return self._kb_control
+    
+    def get_whitelist_keyboard(self) -> InlineKeyboardMarkup:
+        """Возвращает клавиатуру для управления белым списком."""
+        return self._kb_whitelist
+    
+    def _get_back_kb(self, target: str) -> InlineKeyboardMarkup:
+        """Возвращает клавиатуру с одной кнопкой "Назад" в указанное меню."""
+        return self._kb_back[target]
+    
+    def _get_remove_player_kb(self, whitelist: Dict[str, Dict]) -> InlineKeyboardMarkup:
+        """Клавиатура со списком игроков для удаления (кэшируется по состоянию whitelist.json)."""
+        stamp = self._wl_stamp
+        if stamp is not None and self._kb_remove and self._kb_remove[0] == stamp:
+            return self._kb_remove[1]
+        
+        rows = [
+            [InlineKeyboardButton(text=f"❌ {name}", callback_data=RemovePlayerCallback(name=name).pack())]
+            for name in whitelist
+        ]
+        rows.append([InlineKeyboardButton(text="↩️ Назад", callback_data="whitelist_menu")])
+        markup = InlineKeyboardMarkup(inline_keyboard=rows)
+        
+        if stamp is not None:
+            self._kb_remove = (stamp, markup)
+        return markup
+    
+    def _cooldown(self, user_id: int, action: str, seconds: float = 2.0) -> bool:
+        """Возвращает False, если пользователь выполнял это действие меньше seconds секунд назад."""
+        now = monotonic()
+        if now - self._last_action.get((user_id, action), float("-inf")) < seconds:
+            return False
+        self._last_action[(user_id, action)] = now
+        return True
+    
+    def _expect_input(self, callback: CallbackQuery, state: str):
+        """Запоминает, что ответ на это сообщение нужно обработать как ввод для state."""
+        self._awaiting_input[(callback.message.chat.id, callback.message.message_id)] = state
+    
+    @staticmethod
+    def _same_markup(current: Optional[InlineKeyboardMarkup], new: Optional[InlineKeyboardMarkup]) -> bool:
+        """Сравнивает клавиатуры по содержимому.
+        
+        Обычное == у моделей aiogram учитывает привязанный бот, поэтому клавиатура из
+        пришедшего сообщения никогда не равна только что собранной.
+        """
+        if current is None or new is None:
+            return current is new
+        return current.model_dump(exclude_none=True) == new.model_dump(exclude_none=True)
+    
+    async def _edit_message(
+        self,
+        callback: CallbackQuery,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ) -> bool:
+        """Редактирует сообщение с кнопками, если текст или клавиатура изменились.
+        
+        Повторное нажатие той же кнопки не тратит запрос к API. Возвращает True, если сообщение изменено.
+        """
+        message = callback.message
+        if (
+            isinstance(message, Message)
+            and message.text is not None
+            and message.html_text == text
+            and self._same_markup(message.reply_markup, reply_markup)
+        ):
+            # Ответы на сообщение больше не считаются вводом, даже если экран тот же
+            self._awaiting_input.pop((message.chat.id, message.message_id), None)
+            return False
+        return await self._replace_message(message, text, reply_markup)
+    
+    async def _replace_message(
+        self,
+        message: Message,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ) -> bool:
+        """Заменяет текст сообщения без сравнения с известным содержимым (оно могло устареть).
+        
+        Совпадение с текущим текстом ошибкой не считается. Возвращает True, если сообщение изменено.
+        """
+        # Сообщение сменит экран, поэтому ответы на него больше не считаются вводом
+        self._awaiting_input.pop((message.chat.id, message.message_id), None)
+        try:
+            await message.edit_text(text, reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            # Текст и клавиатура совпали с текущими - изменять нечего
+            if "message is not modified" not in str(e):
+                raise
+            return False
+        return True
+    
     def _setup_handlers(self):
         """Настройка обработчиков."""
         
         @self.router.message(Command("start"))
         async def cmd_start(message: Message):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этому боту.")
-                return
-            
             welcome_text = (
                 "🤖 <b>Minecraft Server Bot</b>\n\n"
                 "Добро пожаловать в панель управления Minecraft сервером!\n\n"
@@ -1190,28 +1787,16 @@ class MinecraftServerBot:
         
         @self.router.message(Command("status"))
         async def cmd_status(message: Message):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
-            status_text = self.get_server_status()
+            status_text = await self._get_status_cached()
             await message.answer(status_text)
         
         @self.router.message(Command("info"))
         async def cmd_info(message: Message):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
-            info_text = self.get_server_info()
+            info_text = await self._get_info_cached()
             await message.answer(info_text)
         
         @self.router.message(Command("logs"))
         async def cmd_logs(message: Message, command: CommandObject):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
             lines = 50
             if command.args:
                 try:
@@ -1220,18 +1805,12 @@ class MinecraftServerBot:
                 except ValueError:
                     lines = 50
             
-            logs_text = self.get_logs(lines)
-            if len(logs_text) > 4000:
-                logs_text = logs_text[-4000:]
+            logs_text = await self.get_logs(lines, max_chars=4000)
             
             await message.answer(f"<code>{logs_text}</code>")
         
         @self.router.message(Command("whitelist"))
         async def cmd_whitelist(message: Message):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
             await message.answer(
                 "👥 <b>Управление белым списком</b>\nВыберите действие:",
                 reply_markup=self.get_whitelist_keyboard(),
@@ -1239,23 +1818,14 @@ class MinecraftServerBot:
         
         @self.router.message(Command("backup"))
         async def cmd_backup(message: Message):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
             await message.answer("⏳ Создаю бэкап мира...")
-            success, result, backup_path = self.create_backup()
+            success, result, backup_path = await self.create_backup()
             
             if success and backup_path:
                 await message.answer(f"✅ {result}")
                 
                 try:
-                    with open(backup_path, "rb") as file:
-                        await self.bot.send_document(
-                            chat_id=self.config.BACKUP_CHAT_ID,
-                            document=types.BufferedInputFile(file.read(), filename=backup_path.name),
-                            caption=f"📦 Бэкап мира Minecraft\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                        )
+                    await self._send_backup(backup_path, "📦 Бэкап мира Minecraft")
                 except Exception as e:
                     await message.answer(f"⚠️ Бэкап создан, но не отправлен в чат: {e}")
             else:
@@ -1263,15 +1833,11 @@ class MinecraftServerBot:
         
         @self.router.message(Command("command"))
         async def cmd_command(message: Message, command: CommandObject):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
             if not command.args:
                 await message.answer("Использование: /command <команда>\nПример: /command say Привет!")
                 return
             
-            success, result = self.execute_server_command(command.args)
+            success, result = await self.execute_server_command(command.args)
             if success:
                 await message.answer(f"✅ Команда отправлена: <code>{command.args}</code>")
             else:
@@ -1279,15 +1845,11 @@ class MinecraftServerBot:
         
         @self.router.message(Command("message"))
         async def cmd_message(message: Message, command: CommandObject):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
             if not command.args:
                 await message.answer("Использование: /message <текст>\nПример: /message Внимание, сервер перезагружается!")
                 return
             
-            success, result = self.execute_server_command(f"say {command.args}")
+            success, result = await self.execute_server_command(f"say {command.args}")
             if success:
                 await message.answer(f"✅ Сообщение отправлено: {command.args}")
             else:
@@ -1295,10 +1857,6 @@ class MinecraftServerBot:
         
         @self.router.message(Command("help"))
         async def cmd_help(message: Message):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
             help_text = (
                 "📚 <b>Помощь по командам</b>\n\n"
                 "<b>Основные команды:</b>\n"
@@ -1333,11 +1891,7 @@ class MinecraftServerBot:
         
         @self.router.message(Command("online"))
         async def cmd_online(message: Message):
-            if not self.is_admin(message.from_user.id):
-                await message.answer("⛔ У вас нет доступа к этой команде.")
-                return
-            
-            online_count, online_players = self.get_online_players_info()
+            online_count, online_players = await self.get_online_players_info()
             
             if online_count > 0:
                 players_list = "\n".join([f"• {player}" for player in online_players])
@@ -1350,31 +1904,19 @@ class MinecraftServerBot:
         # Обработчики кнопок
         @self.router.callback_query(F.data == "server_status")
         async def callback_server_status(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            status_text = self.get_server_status()
-            await callback.message.edit_text(status_text, reply_markup=self.get_main_keyboard())
+            status_text = await self._get_status_cached()
+            await self._edit_message(callback, status_text, reply_markup=self.get_main_keyboard())
             await callback.answer()
         
         @self.router.callback_query(F.data == "server_info")
         async def callback_server_info(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            info_text = self.get_server_info()
-            await callback.message.edit_text(info_text, reply_markup=self.get_main_keyboard())
+            info_text = await self._get_info_cached()
+            await self._edit_message(callback, info_text, reply_markup=self.get_main_keyboard())
             await callback.answer()
         
         @self.router.callback_query(F.data == "online_players")
         async def callback_online_players(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            online_count, online_players = self.get_online_players_info()
+            online_count, online_players = await self.get_online_players_info()
             
             if online_count > 0:
                 players_list = "\n".join([f"• {player}" for player in online_players])
@@ -1382,20 +1924,15 @@ class MinecraftServerBot:
             else:
                 online_text = "🎮 <b>Игроков онлайн: 0</b>\n\nСервер пуст"
             
-            await callback.message.edit_text(online_text, reply_markup=self.get_main_keyboard())
+            await self._edit_message(callback, online_text, reply_markup=self.get_main_keyboard())
             await callback.answer()
         
         @self.router.callback_query(F.data == "server_logs")
         async def callback_server_logs(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            logs_text = self.get_logs(50)
-            if len(logs_text) > 4000:
-                logs_text = logs_text[-4000:]
+            logs_text = await self.get_logs(50, max_chars=4000)
             
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 f"📜 <b>Последние 50 строк логов:</b>\n\n<code>{logs_text}</code>",
                 reply_markup=self.get_main_keyboard(),
             )
@@ -1403,42 +1940,39 @@ class MinecraftServerBot:
         
         @self.router.callback_query(F.data == "service_status")
         async def callback_service_status(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
             try:
                 # Получаем детальный статус сервиса
-                result = subprocess.run(
-                    ["systemctl", "status", self.config.SERVER_SERVICE, "--no-pager", "-l"],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
+                _, stdout, _ = await self._cached(
+                    "service_status", 5.0,
+                    lambda: self._run("systemctl", "status", self.config.SERVER_SERVICE, "--no-pager", "-l", timeout=10)
                 )
                 
                 status_text = f"🔍 <b>Статус сервиса {self.config.SERVER_SERVICE}</b>\n\n"
                 
-                if result.stdout:
+                if stdout:
                     # Ограничиваем вывод для Telegram
-                    output = result.stdout
+                    output = stdout
                     if len(output) > 3500:
                         output = output[:3500] + "\n... (обрезано)"
                     status_text += f"<code>{output}</code>"
                 else:
                     status_text += "Информация о сервисе недоступна"
                 
-                await callback.message.edit_text(
+                await self._edit_message(
+                    callback,
                     status_text,
                     reply_markup=self.get_main_keyboard(),
                 )
                 
-            except subprocess.TimeoutExpired:
-                await callback.message.edit_text(
+            except asyncio.TimeoutError:
+                await self._edit_message(
+                    callback,
                     "⏱️ Таймаут получения статуса сервиса",
                     reply_markup=self.get_main_keyboard(),
                 )
             except Exception as e:
-                await callback.message.edit_text(
+                await self._edit_message(
+                    callback,
                     f"❌ Ошибка получения статуса: {e}",
                     reply_markup=self.get_main_keyboard(),
                 )
@@ -1447,11 +1981,8 @@ class MinecraftServerBot:
         
         @self.router.callback_query(F.data == "server_control")
         async def callback_server_control(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "⚙️ <b>Управление сервером</b>\nВыберите действие:",
                 reply_markup=self.get_control_keyboard(),
             )
@@ -1459,11 +1990,8 @@ class MinecraftServerBot:
         
         @self.router.callback_query(F.data == "whitelist_menu")
         async def callback_whitelist_menu(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "👥 <b>Управление белым списком</b>\nВыберите действие:",
                 reply_markup=self.get_whitelist_keyboard(),
             )
@@ -1471,28 +1999,21 @@ class MinecraftServerBot:
         
         @self.router.callback_query(F.data == "show_whitelist")
         async def callback_show_whitelist(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
             whitelist = self.load_whitelist()
             if not whitelist:
                 text = "📋 <b>Белый список пуст</b>"
             else:
-                players = "\n".join([f"• {player.get('name', 'Unknown')}" for player in whitelist])
+                players = "\n".join([f"• {name}" for name in whitelist])
                 text = f"📋 <b>Белый список ({len(whitelist)} игроков):</b>\n\n{players}"
             
-            await callback.message.edit_text(text, reply_markup=self.get_whitelist_keyboard())
+            await self._edit_message(callback, text, reply_markup=self.get_whitelist_keyboard())
             await callback.answer()
         
         @self.router.callback_query(F.data == "back_to_main")
         async def callback_back_to_main(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
-                "🤖 <b>Главное меню</b>\nВыберите действие:",
+            await self._edit_message(
+                callback,
+                MAIN_MENU_TEXT,
                 reply_markup=self.get_main_keyboard(),
             )
             await callback.answer()
@@ -1500,257 +2021,137 @@ class MinecraftServerBot:
         # Обработчики управления сервером
         @self.router.callback_query(F.data == "start_server")
         async def callback_start_server(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
             try:
-                subprocess.run(["systemctl", "start", self.config.SERVER_SERVICE], check=True)
+                await self._systemctl("start")
                 await callback.answer("✅ Сервер запускается...")
-                await asyncio.sleep(3)
-                await callback.message.edit_text(self.get_server_status(), reply_markup=self.get_control_keyboard())
+                await self._wait_for_service(active=True)
+                self._invalidate_cache()
+                await self._edit_message(callback, await self._get_status_cached(), reply_markup=self.get_control_keyboard())
             except Exception as e:
                 await callback.answer(f"❌ Ошибка: {e}")
         
         @self.router.callback_query(F.data == "stop_server")
         async def callback_stop_server(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            try:
-                # Сначала отправляем предупреждение игрокам
-                self.execute_server_command("say ⚠️ Сервер останавливается через 10 секунд!")
-                await asyncio.sleep(10)
-                
-                subprocess.run(["systemctl", "stop", self.config.SERVER_SERVICE], check=True)
-                await callback.answer("⏹️ Сервер остановлен")
-                await asyncio.sleep(3)
-                await callback.message.edit_text(self.get_server_status(), reply_markup=self.get_control_keyboard())
-            except Exception as e:
-                await callback.answer(f"❌ Ошибка: {e}")
+            # Предупреждение, ожидание и остановка идут в фоне, обработчик сразу отвечает
+            if self._schedule_server_action("stop", "⚠️ Сервер останавливается через 10 секунд!", callback.message):
+                await callback.answer("⏹️ Сервер остановится через 10 секунд")
+            else:
+                await callback.answer("⏳ Предыдущее действие с сервером еще выполняется", show_alert=True)
         
         @self.router.callback_query(F.data == "restart_server")
         async def callback_restart_server(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            try:
-                # Предупреждаем игроков
-                self.execute_server_command("say ⚠️ Сервер перезагружается через 10 секунд!")
-                await asyncio.sleep(10)
-                
-                subprocess.run(["systemctl", "restart", self.config.SERVER_SERVICE], check=True)
-                await callback.answer("🔄 Сервер перезагружается...")
-                await asyncio.sleep(5)
-                await callback.message.edit_text(self.get_server_status(), reply_markup=self.get_control_keyboard())
-            except Exception as e:
-                await callback.answer(f"❌ Ошибка: {e}")
-        
-        @self.router.callback_query(F.data == "save_world")
-        async def callback_save_world(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            self.execute_server_command("save-all")
-            await callback.answer("💾 Команда сохранения отправлена")
-        
-        @self.router.callback_query(F.data == "weather_clear")
-        async def callback_weather_clear(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            self.execute_server_command("weather clear")
-            await callback.answer("☀️ Команда установки ясной погоды отправлена")
-        
-        @self.router.callback_query(F.data == "weather_rain")
-        async def callback_weather_rain(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            self.execute_server_command("weather rain")
-            await callback.answer("🌧️ Команда установки дождя отправлена")
-        
-        @self.router.callback_query(F.data == "weather_thunder")
-        async def callback_weather_thunder(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            self.execute_server_command("weather thunder")
-            await callback.answer("⛈️ Команда установки грозы отправлена")
-        
-        @self.router.callback_query(F.data == "time_day")
-        async def callback_time_day(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            self.execute_server_command("time set day")
-            await callback.answer("🕐 Команда установки дня отправлена")
-        
-        @self.router.callback_query(F.data == "time_night")
-        async def callback_time_night(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            self.execute_server_command("time set night")
-            await callback.answer("🌙 Команда установки ночи отправлена")
+            # Предупреждение, ожидание и перезагрузка идут в фоне, обработчик сразу отвечает
+            if self._schedule_server_action("restart", "⚠️ Сервер перезагружается через 10 секунд!", callback.message):
+                await callback.answer("🔄 Сервер перезагрузится через 10 секунд")
+            else:
+                await callback.answer("⏳ Предыдущее действие с сервером еще выполняется", show_alert=True)
         
-        @self.router.callback_query(F.data == "list_players")
-        async def callback_list_players(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
+        @self.router.callback_query(F.data.in_(SERVER_COMMAND_BUTTONS))
+        async def callback_server_command_button(callback: CallbackQuery):
+            command, cooldown_key, answer_text = SERVER_COMMAND_BUTTONS[callback.data]
+            if not self._cooldown(callback.from_user.id, cooldown_key):
+                await callback.answer("⏳ Подождите пару секунд")
                 return
             
-            self.execute_server_command("list")
-            await callback.answer("📋 Команда списка игроков отправлена, проверьте логи")
+            await self.execute_server_command(command)
+            await callback.answer(answer_text)
         
         # Обработчики белого списка
         @self.router.callback_query(F.data == "add_player")
         async def callback_add_player(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "Введите никнейм игрока для добавления в белый список:",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="↩️ Назад", callback_data="whitelist_menu")]
-                ]),
+                reply_markup=self._get_back_kb("whitelist_menu"),
             )
+            self._expect_input(callback, "add_player")
             await callback.answer()
         
         @self.router.callback_query(F.data == "remove_player")
         async def callback_remove_player(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
             whitelist = self.load_whitelist()
             if not whitelist:
-                await callback.message.edit_text(
+                await self._edit_message(
+                    callback,
                     "Белый список пуст",
                     reply_markup=self.get_whitelist_keyboard(),
                 )
                 await callback.answer()
                 return
             
-            # Создаем клавиатуру с игроками для удаления
-            builder = InlineKeyboardBuilder()
-            for player in whitelist:
-                player_name = player.get("name", "Unknown")
-                builder.row(InlineKeyboardButton(
-                    text=f"❌ {player_name}",
-                    callback_data=f"remove_player_{player_name}",
-                ))
-            builder.row(InlineKeyboardButton(text="↩️ Назад", callback_data="whitelist_menu"))
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "Выберите игрока для удаления:",
-                reply_markup=builder.as_markup(),
+                reply_markup=self._get_remove_player_kb(whitelist),
             )
             await callback.answer()
         
-        @self.router.callback_query(F.data.startswith("remove_player_"))
-        async def callback_remove_player_confirm(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            player_name = callback.data.replace("remove_player_", "")
+        @self.router.callback_query(RemovePlayerCallback.filter())
+        async def callback_remove_player_confirm(callback: CallbackQuery, callback_data: RemovePlayerCallback):
+            player_name = callback_data.name
             
             # Загружаем текущий белый список
             whitelist = self.load_whitelist()
             
             # Ищем и удаляем игрока
-            new_whitelist = [p for p in whitelist if p.get("name") != player_name]
-            
-            if len(new_whitelist) == len(whitelist):
+            if whitelist.pop(player_name, None) is None:
                 # Игрок не найден
-                await callback.message.edit_text(
+                await self._edit_message(
+                    callback,
                     f"Игрок '{player_name}' не найден в белом списке",
                     reply_markup=self.get_whitelist_keyboard(),
                 )
             else:
                 # Сохраняем изменения
-                if self.save_whitelist(new_whitelist):
+                if self.save_whitelist(whitelist):
                     # Обновляем на сервере
-                    self.execute_server_command(f"whitelist remove {player_name}")
-                    self.execute_server_command("whitelist reload")
-                    await callback.message.edit_text(
+                    await self.execute_server_command(f"whitelist remove {player_name}", "whitelist reload")
+                    await self._edit_message(
+                        callback,
                         f"✅ Игрок '{player_name}' удален из белого списка",
                         reply_markup=self.get_whitelist_keyboard(),
                     )
                 else:
-                    await callback.message.edit_text(
+                    await self._edit_message(
+                        callback,
                         f"❌ Ошибка при удалении игрока '{player_name}'",
                         reply_markup=self.get_whitelist_keyboard(),
                     )
             await callback.answer()
         
-        @self.router.callback_query(F.data == "refresh_whitelist")
-        async def callback_refresh_whitelist(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            self.execute_server_command("whitelist reload")
-            await callback.answer("🔄 Белый список обновлен на сервере")
-        
         @self.router.callback_query(F.data == "create_backup")
         async def callback_create_backup(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text("⏳ Создаю бэкап мира...")
-            success, result, backup_path = self.create_backup()
+            # Отвечаем сразу: бэкап может идти дольше, чем живет callback query
+            await callback.answer()
+            await self._edit_message(callback, "⏳ Создаю бэкап мира...")
+            success, result, backup_path = await self.create_backup()
             
+            # Итог показываем одним редактированием сообщения
             if success and backup_path:
-                await callback.message.edit_text(f"✅ {result}")
-                
                 try:
-                    with open(backup_path, "rb") as file:
-                        await self.bot.send_document(
-                            chat_id=self.config.BACKUP_CHAT_ID,
-                            document=types.BufferedInputFile(file.read(), filename=backup_path.name),
-                            caption=f"📦 Бэкап мира Minecraft\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-                        )
+                    await self._send_backup(backup_path, "📦 Бэкап мира Minecraft")
+                    await self._replace_message(callback.message, f"✅ {result}")
                 except Exception as e:
-                    await callback.message.edit_text(f"⚠️ Бэкап создан, но не отправлен в чат: {e}")
+                    await self._replace_message(callback.message, f"⚠️ Бэкап создан, но не отправлен в чат: {e}")
             else:
-                await callback.message.edit_text(f"❌ {result}")
-            await callback.answer()
+                await self._replace_message(callback.message, f"❌ {result}")
         
         @self.router.callback_query(F.data == "send_message")
         async def callback_send_message(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "Введите сообщение для отправки в чат сервера:",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="↩️ Назад", callback_data="back_to_main")]
-                ]),
+                reply_markup=self._get_back_kb("back_to_main"),
             )
+            self._expect_input(callback, "send_message")
             await callback.answer()
         
         # Обработчики настроек бэкапов
         @self.router.callback_query(F.data == "backup_settings")
         async def callback_backup_settings(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
             settings_text = self._get_backup_settings_text()
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 settings_text,
                 reply_markup=self.get_backup_settings_keyboard(),
             )
@@ -1758,10 +2159,6 @@ class MinecraftServerBot:
         
         @self.router.callback_query(F.data == "toggle_auto_backup")
         async def callback_toggle_auto_backup(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
             self.backup_settings["enabled"] = not self.backup_settings.get("enabled", False)
             self.save_backup_settings()
             self.setup_auto_backup()
@@ -1770,30 +2167,24 @@ class MinecraftServerBot:
             await callback.answer(f"✅ Автобэкапы {status}")
             
             settings_text = self._get_backup_settings_text()
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 settings_text,
                 reply_markup=self.get_backup_settings_keyboard(),
             )
         
         @self.router.callback_query(F.data == "set_backup_interval")
         async def callback_set_backup_interval(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "⏰ <b>Выберите интервал для автобэкапов:</b>",
                 reply_markup=self.get_interval_keyboard(),
             )
             await callback.answer()
         
-        @self.router.callback_query(F.data.startswith("interval_"))
-        async def callback_set_interval(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            interval = callback.data.replace("interval_", "")
+        @self.router.callback_query(BackupIntervalCallback.filter())
+        async def callback_set_interval(callback: CallbackQuery, callback_data: BackupIntervalCallback):
+            interval = callback_data.interval
             self.backup_settings["interval"] = interval
             self.save_backup_settings()
             self.setup_auto_backup()
@@ -1809,281 +2200,224 @@ class MinecraftServerBot:
             await callback.answer(f"✅ Интервал установлен: {interval_names.get(interval, interval)}")
             
             settings_text = self._get_backup_settings_text()
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 settings_text,
                 reply_markup=self.get_backup_settings_keyboard(),
             )
         
         @self.router.callback_query(F.data == "set_backup_time")
         async def callback_set_backup_time(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "🕐 <b>Введите время для бэкапов в формате ЧЧ:ММ</b>\n\n"
                 "Например: 03:00 или 15:30\n"
                 "Время указывается в 24-часовом формате.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="↩️ Назад", callback_data="backup_settings")]
-                ]),
+                reply_markup=self._get_back_kb("backup_settings"),
             )
+            self._expect_input(callback, "backup_time")
             await callback.answer()
         
         @self.router.callback_query(F.data == "set_backup_count")
         async def callback_set_backup_count(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 "📦 <b>Введите количество бэкапов для хранения</b>\n\n"
                 "Рекомендуется: 5-10 бэкапов\n"
                 "Старые бэкапы будут автоматически удаляться.",
-                reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                    [InlineKeyboardButton(text="↩️ Назад", callback_data="backup_settings")]
-                ]),
+                reply_markup=self._get_back_kb("backup_settings"),
             )
+            self._expect_input(callback, "backup_count")
             await callback.answer()
         
         # Обработчики настроек логов
         @self.router.callback_query(F.data == "logs_settings")
         async def callback_logs_settings(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
             settings_text = self._get_logs_settings_text()
-            await callback.message.edit_text(
+            await self._edit_message(
+                callback,
                 settings_text,
                 reply_markup=self.get_logs_settings_keyboard(),
             )
             await callback.answer()
         
+        @self.router.callback_query(F.data == "set_logs_time")
+        async def callback_set_logs_time(callback: CallbackQuery):
+            await self._edit_message(
+                callback,
+                "🕐 <b>Введите время отправки логов в формате ЧЧ:ММ</b>\n\n"
+                "Например: 04:00 или 16:30\n"
+                "Время указывается в 24-часовом формате.",
+                reply_markup=self._get_back_kb("logs_settings"),
+            )
+            self._expect_input(callback, "logs_time")
+            await callback.answer()
+        
         @self.router.callback_query(F.data == "send_logs_now")
         async def callback_send_logs_now(callback: CallbackQuery):
-            if not self.is_admin(callback.from_user.id):
-                await callback.answer("⛔ Нет доступа", show_alert=True)
-                return
-            
-            await callback.message.edit_text("⏳ Создаю архив логов...")
+            # Отвечаем сразу: архив может собираться дольше, чем живет callback query
+            await callback.answer()
+            await self._edit_message(callback, "⏳ Создаю архив логов...")
             
-            success, result, logs_path = self.create_logs_archive()
+            success, result, logs_path = await asyncio.to_thread(self.create_logs_archive)
             
             if success and logs_path:
                 try:
                     chat_id = self.logs_settings.get("chat_id", self.config.BACKUP_CHAT_ID)
-                    with open(logs_path, "rb") as file:
-                        await self.bot.send_document(
-                            chat_id=chat_id,
-                            document=types.BufferedInputFile(file.read(), filename=logs_path.name),
-                            caption=f"📋 Ручная отправка логов сервера\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{result}",
-                        )
+                    await self.bot.send_document(
+                        chat_id=chat_id,
+                        document=types.FSInputFile(logs_path, filename=logs_path.name, chunk_size=UPLOAD_CHUNK_SIZE),
+                        caption=f"📋 Ручная отправка логов сервера\nДата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n{result}",
+                    )
                     
                     # Удаляем временный файл
                     logs_path.unlink()
                     
-                    await callback.message.edit_text(
+                    await self._replace_message(
+                        callback.message,
                         f"✅ Логи отправлены в чат {chat_id}",
                         reply_markup=self.get_main_keyboard(),
                     )
                 except Exception as e:
                     if logs_path.exists():
                         logs_path.unlink()
-                    await callback.message.edit_text(
+                    await self._replace_message(
+                        callback.message,
                         f"❌ Ошибка отправки логов: {e}",
                         reply_markup=self.get_main_keyboard(),
                     )
             else:
-                await callback.message.edit_text(
+                await self._replace_message(
+                    callback.message,
                     f"❌ {result}",
                     reply_markup=self.get_main_keyboard(),
                 )
-            
-            await callback.answer()
         
         # Обработчик текстовых сообщений
         @self.router.message(F.text)
         async def handle_text(message: Message):
-            if not self.is_admin(message.from_user.id):
-                return
-            
-            # Проверяем, находимся ли мы в режиме добавления игрока
-            if message.reply_to_message and message.reply_to_message.text and "никнейм игрока" in message.reply_to_message.text:
-                player_name = message.text.strip()
-                
-                # Загружаем текущий белый список
-                whitelist = self.load_whitelist()
-                
-                # Проверяем, нет ли уже такого игрока
-                for player in whitelist:
-                    if player.get("name") == player_name:
-                        await message.answer(
-                            f"❌ Игрок '{player_name}' уже есть в белом списке",
-                            reply_markup=self.get_whitelist_keyboard(),
-                        )
-                        return
-                
-                # Добавляем игрока
-                whitelist.append({"uuid": "", "name": player_name})
-                if self.save_whitelist(whitelist):
-                    # Добавляем на сервере
-                    success, result = self.execute_server_command(f"whitelist add {player_name}")
-                    self.execute_server_command("whitelist reload")
-                    
-                    if success:
-                        await message.answer(
-                            f"✅ Игрок '{player_name}' добавлен в белый список",
-                            reply_markup=self.get_whitelist_keyboard(),
-                        )
-                    else:
-                        await message.answer(
-                            f"⚠️ Игрок добавлен в файл, но ошибка на сервере: {result}",
-                            reply_markup=self.get_whitelist_keyboard(),
-                        )
-                else:
-                    await message.answer(
-                        f"❌ Ошибка при добавлении игрока '{player_name}'",
-                        reply_markup=self.get_whitelist_keyboard(),
-                    )
-                return
-            
-            # Проверяем, находимся ли мы в режиме отправки сообщения
-            elif message.reply_to_message and message.reply_to_message.text and "сообщение для отправки" in message.reply_to_message.text:
-                text = message.text.strip()
-                success, result = self.execute_server_command(f"say {text}")
-                if success:
-                    await message.answer(
-                        f"✅ Сообщение отправлено: {text}",
-                        reply_markup=self.get_main_keyboard(),
-                    )
-                else:
-                    await message.answer(
-                        f"❌ Ошибка: {result}",
-                        reply_markup=self.get_main_keyboard(),
-                    )
-                return
-            
-            # Проверяем, находимся ли мы в режиме ввода времени бэкапа
-            elif message.reply_to_message and message.reply_to_message.text and "время для бэкапов" in message.reply_to_message.text:
-                time_text = message.text.strip()
-                
-                # Проверяем формат времени
-                try:
-                    time_parts = time_text.split(":")
-                    if len(time_parts) != 2:
-                        raise ValueError("Неверный формат")
-                    
-                    hour = int(time_parts[0])
-                    minute = int(time_parts[1])
-                    
-                    if not (0 <= hour <= 23) or not (0 <= minute <= 59):
-                        raise ValueError("Неверное время")
-                    
-                    # Форматируем время
-                    formatted_time = f"{hour:02d}:{minute:02d}"
-                    
-                    self.backup_settings["time"] = formatted_time
-                    self.save_backup_settings()
-                    self.setup_auto_backup()
-                    
-                    await message.answer(
-                        f"✅ Время бэкапов установлено: {formatted_time}",
-                        reply_markup=self.get_backup_settings_keyboard(),
-                    )
-                    
-                except ValueError:
-                    await message.answer(
-                        "❌ Неверный формат времени!\n\n"
-                        "Используйте формат ЧЧ:ММ (например: 03:00 или 15:30)",
-                        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                            [InlineKeyboardButton(text="↩️ Назад", callback_data="backup_settings")]
-                        ]),
-                    )
-                return
-            
-            # Проверяем, находимся ли мы в режиме ввода количества бэкапов
-            elif message.reply_to_message and message.reply_to_message.text and "количество бэкапов" in message.reply_to_message.text:
-                try:
-                    count = int(message.text.strip())
-                    
-                    if count < 1 or count > 50:
-                        raise ValueError("Количество должно быть от 1 до 50")
-                    
-                    self.backup_settings["keep_count"] = count
-                    self.save_backup_settings()
-                    
-                    await message.answer(
-                        f"✅ Количество хранимых бэкапов установлено: {count}",
-                        reply_markup=self.get_backup_settings_keyboard(),
-                    )
-                    
-                except ValueError as e:
-                    await message.answer(
-                        f"❌ Неверное значение!\n\n"
-                        f"Введите число от 1 до 50",
-                        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                            [InlineKeyboardButton(text="↩️ Назад", callback_data="backup_settings")]
-                        ]),
-                    )
-                return
+            # Ответ на сообщение с запросом ввода: режим определяется по его ID
+            reply = message.reply_to_message
+            input_state = self._awaiting_input.get((message.chat.id, reply.message_id)) if reply else None
+            input_handler = self._input_handlers.get(input_state)
+            if input_handler:
+                # Обработчик возвращает текст ответа и клавиатуру, либо None, если ответил сам
+                result = await input_handler(message)
+                if result is None:
+                    return
+                text, reply_markup = result
+            else:
+                # Если это не ответ на запрос, показываем меню
+                text, reply_markup = MAIN_MENU_TEXT, self.get_main_keyboard()
             
-            # Проверяем, находимся ли мы в режиме ввода времени логов
-            elif message.reply_to_message and message.reply_to_message.text and "время для отправки логов" in message.reply_to_message.text:
-                time_text = message.text.strip()
-                
-                # Проверяем формат времени
-                try:
-                    time_parts = time_text.split(":")
-                    if len(time_parts) != 2:
-                        raise ValueError("Неверный формат")
-                    
-                    hour = int(time_parts[0])
-                    minute = int(time_parts[1])
-                    
-                    if not (0 <= hour <= 23) or not (0 <= minute <= 59):
-                        raise ValueError("Неверное время")
-                    
-                    # Форматируем время
-                    formatted_time = f"{hour:02d}:{minute:02d}"
-                    
-                    self.logs_settings["time"] = formatted_time
-                    self.save_logs_settings()
-                    self.setup_auto_logs()
-                    
-                    await message.answer(
-                        f"✅ Время отправки логов установлено: {formatted_time}",
-                        reply_markup=self.get_logs_settings_keyboard(),
-                    )
-                    
-                except ValueError:
-                    await message.answer(
-                        "❌ Неверный формат времени!\n\n"
-                        "Используйте формат ЧЧ:ММ (например: 04:00 или 16:30)",
-                        reply_markup=InlineKeyboardMarkup(inline_keyboard=[
-                            [InlineKeyboardButton(text="↩️ Назад", callback_data="logs_settings")]
-                        ]),
-                    )
-                return
+            await message.answer(text, reply_markup=reply_markup)
+    
+    async def _on_add_player_input(self, message: Message) -> Optional[InputReply]:
+        """Добавляет игрока в белый список по введенному никнейму (результат дописывает в сообщение о ходе)."""
+        player_name = message.text.strip()
+        
+        # Загружаем текущий белый список
+        whitelist = self.load_whitelist()
+        
+        # Проверяем, нет ли уже такого игрока
+        if player_name.lower() in self._wl_names_lower:
+            return f"❌ Игрок '{player_name}' уже есть в белом списке", self.get_whitelist_keyboard()
+        
+        # Сразу подтверждаем прием, результат допишем в это же сообщение
+        ack = await message.answer(f"⏳ Добавляю игрока '{player_name}'...")
+        
+        # Добавляем игрока
+        whitelist[player_name] = {"uuid": "", "name": player_name}
+        if self.save_whitelist(whitelist):
+            # Добавляем на сервере
+            success, result = await self.execute_server_command(f"whitelist add {player_name}", "whitelist reload")
             
-            # Если это не ответ на запрос, показываем меню
-            await message.answer(
-                "🤖 <b>Главное меню</b>\nВыберите действие:",
-                reply_markup=self.get_main_keyboard(),
-            )
+            if success:
+                text = f"✅ Игрок '{player_name}' добавлен в белый список"
+            else:
+                text = f"⚠️ Игрок добавлен в файл, но ошибка на сервере: {result}"
+        else:
+            text = f"❌ Ошибка при добавлении игрока '{player_name}'"
+        
+        await ack.edit_text(text, reply_markup=self.get_whitelist_keyboard())
+        return None
+    
+    async def _on_send_message_input(self, message: Message) -> InputReply:
+        """Отправляет введенный текст в чат сервера."""
+        text = message.text.strip()
+        success, result = await self.execute_server_command(f"say {text}")
+        if success:
+            return f"✅ Сообщение отправлено: {text}", self.get_main_keyboard()
+        else:
+            return f"❌ Ошибка: {result}", self.get_main_keyboard()
+    
+    async def _on_backup_time_input(self, message: Message) -> InputReply:
+        """Устанавливает время автобэкапов."""
+        time_text = message.text.strip()
+        
+        # Проверяем формат времени
+        match = TIME_RE.fullmatch(time_text)
+        if not match:
+            return "❌ Неверный формат времени!\n\nИспользуйте формат ЧЧ:ММ (например: 03:00 или 15:30)", self._get_back_kb("backup_settings")
+        
+        # Форматируем время
+        formatted_time = f"{int(match.group(1)):02d}:{int(match.group(2)):02d}"
+        
+        self.backup_settings["time"] = formatted_time
+        self.save_backup_settings()
+        self.setup_auto_backup()
+        
+        return f"✅ Время бэкапов установлено: {formatted_time}", self.get_backup_settings_keyboard()
+    
+    async def _on_backup_count_input(self, message: Message) -> InputReply:
+        """Устанавливает количество хранимых бэкапов."""
+        count_text = message.text.strip()
+        
+        # isascii() отсекает цифры других алфавитов, которые isdigit() тоже пропускает
+        if not (count_text.isascii() and count_text.isdigit() and 1 <= int(count_text) <= 50):
+            return "❌ Неверное значение!\n\nВведите число от 1 до 50", self._get_back_kb("backup_settings")
+        
+        count = int(count_text)
+        self.backup_settings["keep_count"] = count
+        self.save_backup_settings()
+        
+        return f"✅ Количество хранимых бэкапов установлено: {count}", self.get_backup_settings_keyboard()
+    
+    async def _on_logs_time_input(self, message: Message) -> InputReply:
+        """Устанавливает время автоотправки логов."""
+        time_text = message.text.strip()
+        
+        # Проверяем формат времени
+        match = TIME_RE.fullmatch(time_text)
+        if not match:
+            return "❌ Неверный формат времени!\n\nИспользуйте формат ЧЧ:ММ (например: 04:00 или 16:30)", self._get_back_kb("logs_settings")
+        
+        # Форматируем время
+        formatted_time = f"{int(match.group(1)):02d}:{int(match.group(2)):02d}"
+        
+        self.logs_settings["time"] = formatted_time
+        self.save_logs_settings()
+        self.setup_auto_logs()
+        
+        return f"✅ Время отправки логов установлено: {formatted_time}", self.get_logs_settings_keyboard()
     
     async def start_polling(self):
         """Запуск бота."""
         logger.info("Запуск Minecraft Server Bot...")
-        # Обновляем метод start_polling для загрузки настроек логов
-        self.load_whitelist()
-        self.load_backup_settings()
-        self.load_logs_settings()
+        # Файлы независимы - читаем их параллельно, не блокируя цикл событий
+        await asyncio.gather(
+            asyncio.to_thread(self.load_whitelist),
+            asyncio.to_thread(self.load_backup_settings),
+            asyncio.to_thread(self.load_logs_settings),
+        )
+        # Расписания зависят от загруженных настроек
         self.setup_auto_backup()
         self.setup_auto_logs()
         
         try:
-            await self.bot.delete_webhook()
+            # Накопившиеся за время простоя обновления сбрасываем, чтобы не выполнять
+            # устаревшие команды и не упереться в лимиты Telegram всплеском ответов
+            await self.bot.delete_webhook(drop_pending_updates=True)
             await self.dp.start_polling(self.bot)
         except asyncio.CancelledError:
             logger.info("Бот остановлен")
@@ -2092,6 +2426,7 @@ class MinecraftServerBot:
                 self.backup_job.stop()
             if self.logs_job:
                 self.logs_job.stop()
+            await self._close_rcon()
             await self.bot.session.close()
 
 
@@ -2101,18 +2436,28 @@ def setup_logging(config: Config) -> None:
         datefmt=config.LOG_DATE_FORMAT
     )
     
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(color_formatter)
+    # В файл пишем без цветовых кодов
+    file_handler = logging.FileHandler(config.LOG_FILE, encoding='utf-8')
+    file_handler.setFormatter(logging.Formatter(fmt=config.LOG_FORMAT, datefmt=config.LOG_DATE_FORMAT))
+    
+    # Консоль и файл обслуживает отдельный поток, а логгеры только кладут записи в очередь,
+    # поэтому запись на диск не задерживает цикл событий
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, file_handler)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # Итоговое форматирование делают обработчики в потоке, сюда кладем только текст сообщения
+    queue_handler.setFormatter(logging.Formatter("%(message)s"))
+    
     logging.basicConfig(
         level=config.LOG_LEVEL,
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler(config.LOG_FILE, encoding='utf-8')
-        ]
+        handlers=[queue_handler]
     )
     
-    root_logger = logging.getLogger()
-    for handler in root_logger.handlers:
-        if isinstance(handler, logging.StreamHandler):
-            handler.setFormatter(color_formatter)
+    listener.start()
+    # Дописываем оставшиеся записи при выходе
+    atexit.register(listener.stop)
 
 
 async def main() -> None:
@@ -2120,13 +2465,8 @@ async def main() -> None:
     setup_logging(config)
     
     # Проверяем права доступа
-    try:
-        import os
-        if os.geteuid() != 0:
-            logger.warning("Бот запущен не от root пользователя. Некоторые функции могут не работать корректно")
-    except AttributeError:
-        # Windows не имеет geteuid
-        pass
+    if not IS_ROOT:
+        logger.warning("Бот запущен не от root пользователя. Некоторые функции могут не работать корректно")
     
     bot = MinecraftServerBot(config)
     await bot.start_polling()
@@ -2134,7 +2474,10 @@ async def main() -> None:
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if uvloop:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     except Exception as e: